@@ -5,51 +5,214 @@ Now supports:
  - File upload detection (/predict)
  - Live traffic capture using Scapy (start/stop)
  - Live status endpoint for frontend
+
+Development (single process):
+    python api/api_server.py
+
+Production (several Uvicorn workers; the app is imported once before fork,
+and each worker builds its own pipeline pool of IDS_PIPELINE_WORKERS
+processes, default 1, at startup):
+    gunicorn api.api_server:app -k uvicorn.workers.UvicornWorker \
+        -w 4 --preload --bind 0.0.0.0:8000
+
+Live capture state (running flag, capture process, /ws/live subscribers) is
+kept per worker process, so the live endpoints need a single worker (-w 1).
 """
 
+import asyncio
+import aiofiles
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
 from pathlib import Path
-import shutil
 import tempfile
 import os
+import stat
 import sys
 import time
+from urllib.parse import quote
 import pandas as pd
-import numpy as np
-import json
+import polars as pl
+import orjson
 
 # Add project root to path
 project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from inference.live_predict import run_pipeline
-from inference.live_capture_loop import start_capture, stop_capture, is_running, get_last_capture   # NEW IMPORT
+from inference.live_predict import run_pipeline, warm_pipeline
+from inference.live_capture_loop import start_capture, stop_capture, is_running, get_last_capture, add_capture_listener   # NEW IMPORT
+
+UPLOAD_DIR = Path("live/uploads")
+OUTPUT_DIR = Path("live")
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.environ.get("IDS_MAX_UPLOAD_BYTES", 2 << 30))  # 2 GiB
+UPLOAD_PATHS = {"/predict", "/predict_pcap", "/analyze_pcap"}
+
+# Internal nginx location mapped to OUTPUT_DIR (e.g. "/protected/live"); when
+# set, /download hands the transfer to nginx via X-Accel-Redirect
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("IDS_X_ACCEL_REDIRECT_PREFIX")
+
+
+# Pipeline runs are CPU-bound (flow extraction + model inference), so they go
+# to a separate process instead of blocking the event loop / holding the GIL.
+# Created in lifespan, i.e. after Gunicorn forks: a pool built at import time
+# under --preload would share its call/result pipes between all workers.
+pipeline_pool = None
+
+# Processes per pool. Every pool process holds its own copy of the models, and
+# under Gunicorn every worker has its own pool, so default to 1 there.
+PIPELINE_WORKERS = int(os.environ.get(
+    "IDS_PIPELINE_WORKERS",
+    1 if "gunicorn" in sys.modules else max(1, (os.cpu_count() or 2) // 2)
+))
+
+
+def _new_pipeline_pool():
+    """Process pool for run_pipeline; each pool process loads the models once.
+
+    Uses "spawn" so pool processes start from a clean interpreter rather than
+    a fork of a process that may have TensorFlow initialised.
+    """
+    return ProcessPoolExecutor(
+        max_workers=PIPELINE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_pipeline
+    )
+
+
+def _start_pool_processes(pool):
+    """Start all of pool's processes now instead of on the first requests.
+
+    Non-fork pools only spawn a process per submit(), so one no-op job per
+    process is submitted; each runs after that process's warm_pipeline().
+    """
+    return [pool.submit(os.getpid) for _ in range(PIPELINE_WORKERS)]
+
+
+def _replace_broken_pool(broken_pool):
+    """Replace pipeline_pool after a crash (only once if several requests saw it)."""
+    global pipeline_pool
+    if pipeline_pool is broken_pool:
+        print("[API] Pipeline pool broken - starting a new one")
+        pipeline_pool = _new_pipeline_pool()
+        _start_pool_processes(pipeline_pool)
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start the pipeline pool, wait for it to load the models, set up live push."""
+    global _event_loop, pipeline_pool
+    pipeline_pool = _new_pipeline_pool()
+    await asyncio.gather(*map(asyncio.wrap_future, _start_pool_processes(pipeline_pool)))
+    _event_loop = asyncio.get_running_loop()
+    add_capture_listener(_on_live_capture)
+    yield
+    pipeline_pool.shutdown(cancel_futures=True)
+
 
 app = FastAPI(
     title="AI_IDS Inference API",
     description="Network Intrusion Detection System with Binary, Multiclass & Anomaly Detection + Live Capture",
-    version="3.0"
+    version="3.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+class UploadSizeLimitMiddleware:
+    """Refuse upload bodies over max_bytes before they are spooled to disk.
+
+    UploadFile params are spooled by the multipart parser before the endpoint
+    runs, so the limit is enforced on the raw body: an oversized
+    Content-Length is rejected up front, and receive() is wrapped to count
+    the bytes actually sent (chunked or understated bodies). Plain ASGI, so
+    other routes such as /live_status pay only the path check. Registered
+    before CORSMiddleware so CORS wraps it and the 413 reaches the browser.
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None:
+            try:
+                too_large = int(content_length) > self.max_bytes
+            except ValueError:
+                response = ORJSONResponse(status_code=400, content={"detail": "Invalid Content-Length"})
+                await response(scope, receive, send)
+                return
+            if too_large:
+                response = ORJSONResponse(status_code=413, content={"detail": "File too large"})
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised from the body parsing; FastAPI re-raises
+                    # HTTPException there and the app turns it into the 413
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+
 # ============================
 # CORS CONFIG
 # ============================
+# Credentialed CORS needs explicit origins ("*" is rejected by browsers).
+# Comma-separated list, defaults to the Vite dev server (port 8080).
+FRONTEND_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get("FRONTEND_ORIGIN", "http://localhost:8080,http://127.0.0.1:8080").split(",")
+    if origin.strip()
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = Path("live/uploads")
-OUTPUT_DIR = Path("live")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# Flow records are very repetitive JSON, so they compress well
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+def _df_to_records(df):
+    """Convert a DataFrame to JSON-ready records with None for every missing value.
+
+    Done as one vectorized mask instead of walking each cell; also covers pd.NA /
+    NaT, which orjson can't serialize on its own.
+    """
+    clean = df.astype(object).where(pd.notna(df), None)
+    return clean.to_dict(orient="records")
 
 # ============================
 # HEALTH CHECK
@@ -63,7 +226,8 @@ async def root():
             "predict": "/predict",
             "start_live": "/start_live",
             "stop_live": "/stop_live",
-            "live_status": "/live_status"
+            "live_status": "/live_status",
+            "live_ws": "/ws/live"
         }
     }
 
@@ -75,7 +239,7 @@ async def health_check():
 # FILE UPLOAD PREDICTION
 # ============================
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(file: UploadFile = File(...), limit: int = 100, offset: int = 0):
 
     print(f"\n[API] Received: {file.filename}")
 
@@ -92,39 +256,57 @@ async def predict(file: UploadFile = File(...)):
     # ================================
     # SAVE FILE TO live/uploads/
     # ================================
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-    save_path = UPLOAD_DIR / file.filename
-
-    # If file with same name exists → append timestamp
-    if save_path.exists():
-        timestamp = int(time.time())
-        save_path = UPLOAD_DIR / f"{timestamp}_{file.filename}"
-
-    # Save the uploaded file permanently
-    with open(save_path, "wb") as f_out:
-        shutil.copyfileobj(file.file, f_out)
+    # mkstemp creates a fresh file with O_EXCL, so concurrent uploads of the
+    # same filename never collide (UPLOAD_DIR is created at import)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=UPLOAD_DIR,
+        prefix=f"{Path(file.filename).stem}_",
+        suffix=suffix
+    )
+    save_path = Path(tmp_name)
 
-    file_size = save_path.stat().st_size
+    # Save the uploaded file permanently (1 MiB chunks keeps syscalls low).
+    # Its size is already capped: UploadSizeLimitMiddleware stops the request
+    # body at MAX_UPLOAD_BYTES while the multipart parser is still reading it.
+    file_size = 0
+    async with aiofiles.open(fd, "wb") as f_out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            await f_out.write(chunk)
 
     # ================================
     # RUN PIPELINE
     # ================================
-    out_csv = OUTPUT_DIR / f"predictions_{int(time.time())}.csv"
+    out_csv = OUTPUT_DIR / f"predictions_{save_path.stem}.csv"
 
+    pool = pipeline_pool
     try:
-        df_out = run_pipeline(str(save_path), str(out_csv), is_pcap=is_pcap)
+        loop = asyncio.get_running_loop()
+        df_out = await loop.run_in_executor(
+            pool, run_pipeline, str(save_path), str(out_csv), is_pcap
+        )
+    except BrokenProcessPool:
+        # A pool process died (OOM, native crash); the executor is unusable
+        # from now on, so swap in a fresh one for the next requests
+        _replace_broken_pool(pool)
+        raise HTTPException(
+            status_code=503,
+            detail="Inference worker crashed, please retry the upload."
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
 
     # ================================
     # PREPARE RESPONSE
     # ================================
-    label_counts = df_out["Label"].value_counts().to_dict()
-    attack_types = (
-        df_out[df_out["Label"] == "ATTACK"]["Attack_Type"].value_counts().to_dict()
-        if "Attack_Type" in df_out.columns else {}
-    )
+    # Only one page of flows goes into the JSON; the full set is in the CSV
+    offset = max(offset, 0)
+    limit = max(limit, 0)
+    flows_page = df_out.iloc[offset:offset + limit]
+
+    # Counts were computed by run_pipeline and attached to the DataFrame
+    label_counts = df_out.attrs["summary"]
+    attack_types = df_out.attrs["attack_types"]
 
     response = {
         "status": "success",
@@ -132,27 +314,29 @@ async def predict(file: UploadFile = File(...)):
         "file_type": "pcap" if is_pcap else "csv",
         "filename": Path(save_path).name,
         "file_size_bytes": file_size,
-        "total_flows": len(df_out),
+        "total_flows": df_out.attrs["flows"],
         "summary": label_counts,
         "attack_types": attack_types,
         "download_csv": str(out_csv),
-        "data_preview": df_out.head(10).to_dict(orient="records"),
-        "all_flows": df_out.to_dict(orient="records")
+        "data_preview": _df_to_records(df_out.head(10)),
+        "offset": offset,
+        "limit": limit,
+        "all_flows": await run_in_threadpool(_df_to_records, flows_page)
     }
 
-    return JSONResponse(content=response)
+    return ORJSONResponse(content=response)
 
 # ============================
 # LEGACY ENDPOINTS
 # ============================
 @app.post("/predict_pcap")
-async def predict_pcap(file: UploadFile = File(...)):
-    return await predict(file)
+async def predict_pcap(file: UploadFile = File(...), limit: int = 100, offset: int = 0):
+    return await predict(file, limit=limit, offset=offset)
 
 @app.post("/analyze_pcap")
-async def analyze_pcap(file: UploadFile = File(...)):
+async def analyze_pcap(file: UploadFile = File(...), limit: int = 100, offset: int = 0):
     """Alias for /predict endpoint."""
-    return await predict(file)
+    return await predict(file, limit=limit, offset=offset)
 
 # ============================
 # DOWNLOAD CSV
@@ -160,10 +344,38 @@ async def analyze_pcap(file: UploadFile = File(...)):
 @app.get("/download/{filename}")
 async def download_csv(filename: str):
     file_path = OUTPUT_DIR / filename
-    if not file_path.exists():
+    # One stat() both checks the file and is handed to FileResponse so it
+    # doesn't stat again before sendfile()-ing the body
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(path=file_path, media_type="text/csv", filename=filename)
+    # Behind nginx, let the proxy serve the file straight from disk
+    if X_ACCEL_REDIRECT_PREFIX:
+        # Percent-encode the name for both headers (same scheme FileResponse
+        # uses) so spaces, quotes or CR/LF can't break out of them
+        quoted_name = quote(filename)
+        if quoted_name != filename:
+            content_disposition = f"attachment; filename*=utf-8''{quoted_name}"
+        else:
+            content_disposition = f'attachment; filename="{filename}"'
+        return Response(
+            media_type="text/csv",
+            headers={
+                "X-Accel-Redirect": f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quoted_name}",
+                "Content-Disposition": content_disposition
+            }
+        )
+
+    return FileResponse(
+        path=file_path,
+        media_type="text/csv",
+        filename=filename,
+        stat_result=stat_result
+    )
 
 # ===========================================================
 # 🔥 LIVE CAPTURE ENDPOINTS — NEW
@@ -181,75 +393,163 @@ async def stop_live():
     stop_capture()
     return {"status": "live_capture_stopped"}
 
-def replace_nan_with_none(obj):
-    """Recursively replace NaN values with None for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: replace_nan_with_none(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [replace_nan_with_none(item) for item in obj]
-    elif isinstance(obj, (float, np.floating)):
-        if pd.isna(obj) or np.isnan(obj):
-            return None
-        return obj
-    elif isinstance(obj, (int, np.integer)):
-        return int(obj)
-    else:
-        return obj
+# Parsed /live_status payload, keyed on the summary sidecar's (mtime_ns, size).
+# The live loop rewrites it after every capture, so an unchanged key means
+# the cached counts and flow pages are still current.
+_LIVE_CACHE = {"key": None, "payload": None, "pages": {}}
+LIVE_PAGE_CACHE_SIZE = 32
+
+
+def _build_live_payload(summary_path):
+    """Load the summary part of /live_status from the pipeline's sidecar JSON."""
+    summary = orjson.loads(summary_path.read_bytes())
+    return {
+        "flows": summary["flows"],
+        "summary": summary["summary"],
+        "attack_types": summary["attack_types"]
+    }
 
-@app.get("/live_status")
-async def live_status():
-    """Return latest live IDS results with running state."""
-    running = is_running()
-    last_capture = get_last_capture()
-    csv_path = OUTPUT_DIR / "live_predictions.csv"
 
-    if not csv_path.exists():
+def _build_live_flows(parquet_path, offset, limit):
+    """Read one page of live flows and serialize it to a JSON array."""
+    # Rows are written straight to JSON by Polars and embedded as a pre-serialized
+    # fragment, so no per-cell Python objects are built for the flow records
+    page = pl.scan_parquet(parquet_path).slice(offset, limit).collect()
+    return orjson.Fragment(page.write_json())
+
+
+def _live_summary_payload(summary_path):
+    """Summary part of /live_status, re-read only when the sidecar changes."""
+    if not summary_path.exists():
         return {
-            "running": running,
-            "last_capture": last_capture,
             "flows": 0,
             "summary": {"BENIGN": 0, "ANOMALY": 0, "ATTACK": 0},
-            "attack_types": {},
-            "all_flows": []
+            "attack_types": {}
         }
 
-    df = pd.read_csv(csv_path)
-    
-    # Replace NaN values in dataframe with None for JSON serialization
-    df = df.replace({np.nan: None, pd.NA: None})
-    
-    summary = df["Label"].value_counts().to_dict()
-    
-    # Ensure all keys exist
-    result_summary = {
-        "BENIGN": int(summary.get("BENIGN", 0)) if summary.get("BENIGN") is not None else 0,
-        "ANOMALY": int(summary.get("ANOMALY", 0)) if summary.get("ANOMALY") is not None else 0,
-        "ATTACK": int(summary.get("ATTACK", 0)) if summary.get("ATTACK") is not None else 0
-    }
+    st = summary_path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    if _LIVE_CACHE["key"] != key:
+        _LIVE_CACHE["payload"] = _build_live_payload(summary_path)
+        _LIVE_CACHE["pages"] = {}
+        _LIVE_CACHE["key"] = key
+    return _LIVE_CACHE["payload"]
+
 
-    # Get attack types breakdown
-    attack_types = {}
-    if "Attack_Type" in df.columns:
-        attack_df = df[df["Label"] == "ATTACK"]
-        if not attack_df.empty:
-            attack_counts = attack_df["Attack_Type"].value_counts().to_dict()
-            attack_types = {str(k): int(v) for k, v in attack_counts.items() if pd.notna(k) and pd.notna(v)}
+@app.get("/live_status")
+async def live_status(include_flows: bool = False, limit: int = 100, offset: int = 0):
+    """Return latest live IDS results with running state.
 
-    # Convert all flows to records and clean NaN values
-    all_flows = df.replace({np.nan: None, pd.NA: None}).to_dict(orient="records")
-    # Clean the records to ensure no NaN values remain
-    all_flows = replace_nan_with_none(all_flows)
+    Per-flow records are only read and returned when include_flows=true,
+    one page (offset/limit) at a time.
+    """
+    offset = max(offset, 0)
+    limit = max(limit, 0)
+    parquet_path = OUTPUT_DIR / "live_predictions.parquet"
+    summary_path = OUTPUT_DIR / "live_predictions.summary.json"
 
     response = {
-        "running": running,
-        "last_capture": last_capture,
-        "flows": int(len(df)),
-        "summary": result_summary,
-        "attack_types": attack_types,
-        "all_flows": all_flows
+        "running": is_running(),
+        "last_capture": get_last_capture(),
+        **_live_summary_payload(summary_path)
     }
-    
-    return response
+
+    if include_flows:
+        response["offset"] = offset
+        response["limit"] = limit
+        if not parquet_path.exists():
+            response["all_flows"] = []
+            return response
+
+        # Bind the page dict now: the summary check of a concurrent request may
+        # swap in a fresh one while this request waits on the Parquet read
+        pages = _LIVE_CACHE["pages"]
+        page_key = (offset, limit)
+        flows = pages.get(page_key)
+        if flows is None:
+            flows = await run_in_threadpool(_build_live_flows, parquet_path, offset, limit)
+            if len(pages) >= LIVE_PAGE_CACHE_SIZE:
+                pages.clear()
+            pages[page_key] = flows
+        response["all_flows"] = flows
+
+    return ORJSONResponse(content=response)
+
+
+# ============================
+# LIVE PUSH (WEBSOCKET)
+# ============================
+# One bounded queue per connected /ws/live client. Only touched from the event
+# loop; the capture thread hands results over via call_soon_threadsafe.
+_live_subscribers = set()
+_event_loop = None
+LIVE_WS_QUEUE_SIZE = 4
+LIVE_WS_FLOW_LIMIT = 100
+
+
+def _broadcast_live(payload):
+    """Queue payload for every subscriber, dropping the oldest if a client lags."""
+    for queue in _live_subscribers:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+
+def _on_live_capture(df):
+    """Capture-thread callback: push the new results to websocket clients."""
+    if _event_loop is None or not _live_subscribers:
+        return
+    payload = {
+        "running": is_running(),
+        "last_capture": get_last_capture(),
+        "flows": df.attrs["flows"],
+        "summary": df.attrs["summary"],
+        "attack_types": df.attrs["attack_types"],
+        "new_flows": _df_to_records(df.head(LIVE_WS_FLOW_LIMIT))
+    }
+    _event_loop.call_soon_threadsafe(_broadcast_live, payload)
+
+
+@app.websocket("/ws/live")
+async def live_ws(ws: WebSocket):
+    """Push live results after every capture instead of having clients poll."""
+    # CORSMiddleware doesn't apply to WebSockets, so only the configured
+    # frontend origins may subscribe
+    if ws.headers.get("origin") not in FRONTEND_ORIGINS:
+        await ws.close(code=1008)
+        return
+    await ws.accept()
+    queue = asyncio.Queue(maxsize=LIVE_WS_QUEUE_SIZE)
+    _live_subscribers.add(queue)
+    # Clients never send anything, but the socket is read alongside the queue
+    # so a closed tab is noticed right away and not on the next broadcast
+    # (there may never be one once live mode is stopped)
+    receive_task = asyncio.ensure_future(ws.receive())
+    get_task = asyncio.ensure_future(queue.get())
+    try:
+        # Current state first, then one message per completed capture
+        await ws.send_text(orjson.dumps({
+            "running": is_running(),
+            "last_capture": get_last_capture(),
+            **_live_summary_payload(OUTPUT_DIR / "live_predictions.summary.json")
+        }).decode())
+        while True:
+            done, _ = await asyncio.wait(
+                {receive_task, get_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receive_task in done:
+                if receive_task.result()["type"] == "websocket.disconnect":
+                    break
+                receive_task = asyncio.ensure_future(ws.receive())
+            if get_task in done:
+                await ws.send_text(orjson.dumps(get_task.result()).decode())
+                get_task = asyncio.ensure_future(queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive_task.cancel()
+        get_task.cancel()
+        _live_subscribers.discard(queue)
 
 # ===========================================================
 # RUN SERVER
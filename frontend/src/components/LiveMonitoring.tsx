@@ -3,7 +3,7 @@ import { Play, Square, Activity, Shield, AlertTriangle, Skull, FileText, Refresh
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { cn } from "@/lib/utils";
-import { startLiveMonitoring, stopLiveMonitoring, getLiveStatus, LiveStatusResponse, getDownloadUrl } from "@/lib/api";
+import { startLiveMonitoring, stopLiveMonitoring, getLiveStatus, getLiveSocketUrl, LiveStatusResponse, getDownloadUrl } from "@/lib/api";
 import { SummaryResults } from "@/components/SummaryResults";
 import { ApiPredictResponse } from "@/lib/api";
 import { toast } from "@/hooks/use-toast";
@@ -18,34 +18,41 @@ export const LiveMonitoring = () => {
   const [resultData, setResultData] = useState<ApiPredictResponse | null>(null);
   const [hasStartedSession, setHasStartedSession] = useState<boolean>(false);
 
-  // Poll for status updates every 5 seconds (ONLY when monitoring is actively running)
+  // Receive status updates pushed over the WebSocket after each capture
+  // (ONLY when monitoring is actively running). Falls back to polling every
+  // 5 seconds if the socket can't be used.
   useEffect(() => {
     let interval: NodeJS.Timeout | null = null;
+    let socket: WebSocket | null = null;
+    let closedByUs = false;
+
+    const applyStatus = (liveStatus: LiveStatusResponse) => {
+      // Always update status when a new one arrives (only happens when running)
+      setStatus((prevStatus) => {
+        const previousFlowCount = prevStatus?.flows ?? 0;
+        
+        // Show toast when new flows are detected (only during active monitoring)
+        if (liveStatus.running && liveStatus.flows > previousFlowCount && previousFlowCount > 0) {
+          const newFlows = liveStatus.flows - previousFlowCount;
+          toast({
+            title: "Processing flows...",
+            description: `${newFlows} new flow(s) detected and being analyzed`,
+          });
+        }
+        
+        return liveStatus;
+      });
+      
+      setLastFlowCount((prev) => {
+        const currentFlows = liveStatus.flows;
+        return currentFlows > prev ? currentFlows : prev;
+      });
+    };
 
     const fetchStatus = async () => {
       try {
         const liveStatus = await getLiveStatus();
-        
-        // Always update status when polling (only happens when running)
-        setStatus((prevStatus) => {
-          const previousFlowCount = prevStatus?.flows ?? 0;
-          
-          // Show toast when new flows are detected (only during active monitoring)
-          if (liveStatus.running && liveStatus.flows > previousFlowCount && previousFlowCount > 0) {
-            const newFlows = liveStatus.flows - previousFlowCount;
-            toast({
-              title: "Processing flows...",
-              description: `${newFlows} new flow(s) detected and being analyzed`,
-            });
-          }
-          
-          return liveStatus;
-        });
-        
-        setLastFlowCount((prev) => {
-          const currentFlows = liveStatus.flows;
-          return currentFlows > prev ? currentFlows : prev;
-        });
+        applyStatus(liveStatus);
         
         // If monitoring stopped, stop polling
         if (!liveStatus.running) {
@@ -59,17 +66,28 @@ export const LiveMonitoring = () => {
       }
     };
 
-    // Only start polling if monitoring is currently running
-    const currentlyRunning = status?.running ?? false;
-    
-    if (currentlyRunning) {
-      // Initial fetch
+    const startPolling = () => {
+      if (interval) return;
       fetchStatus();
-      
-      // Set up polling interval
       interval = setInterval(() => {
         fetchStatus();
       }, 5000);
+    };
+
+    // Only listen for updates if monitoring is currently running
+    const currentlyRunning = status?.running ?? false;
+    
+    if (currentlyRunning) {
+      try {
+        socket = new WebSocket(getLiveSocketUrl());
+        socket.onmessage = (event) => applyStatus(JSON.parse(event.data));
+        socket.onclose = () => {
+          if (!closedByUs) startPolling();
+        };
+      } catch (error) {
+        console.error("Failed to open live status socket:", error);
+        startPolling();
+      }
     } else {
       // If not running, just do one initial check (for initial page load)
       // This won't poll continuously
@@ -79,6 +97,10 @@ export const LiveMonitoring = () => {
     }
 
     return () => {
+      closedByUs = true;
+      if (socket) {
+        socket.close();
+      }
       if (interval) {
         clearInterval(interval);
       }
@@ -125,7 +147,7 @@ export const LiveMonitoring = () => {
       
       // Wait a moment for final processing, then fetch updated status ONCE
       await new Promise(resolve => setTimeout(resolve, 1500));
-      const liveStatus = await getLiveStatus();
+      const liveStatus = await getLiveStatus(true);
       setStatus(liveStatus);
       
       // Convert live status to result format for display
@@ -100,6 +100,7 @@ export interface LiveStatusResponse {
   };
   attack_types?: Record<string, number>;
   all_flows?: FlowData[];
+  new_flows?: FlowData[];
 }
 
 /**
@@ -136,9 +137,10 @@ export async function stopLiveMonitoring(): Promise<{ status: string }> {
 
 /**
  * Get current live monitoring status
+ * Per-flow records are only included when includeFlows is true
  */
-export async function getLiveStatus(): Promise<LiveStatusResponse> {
-  const response = await fetch(`${API_BASE_URL}/live_status`);
+export async function getLiveStatus(includeFlows = false): Promise<LiveStatusResponse> {
+  const response = await fetch(`${API_BASE_URL}/live_status?include_flows=${includeFlows}`);
 
   if (!response.ok) {
     throw new Error(`HTTP ${response.status}: ${response.statusText}`);
@@ -146,3 +148,10 @@ export async function getLiveStatus(): Promise<LiveStatusResponse> {
 
   return response.json();
 }
+
+/**
+ * WebSocket URL that pushes a LiveStatusResponse after every capture
+ */
+export function getLiveSocketUrl(): string {
+  return `${API_BASE_URL.replace(/^http/, 'ws')}/ws/live`;
+}
@@ -1,85 +1,208 @@
+import multiprocessing
 import threading
 import time
+import shutil
+import subprocess
 from scapy.all import sniff, wrpcap
 from inference.live_predict import run_pipeline
 import pandas as pd
 import os
 from datetime import datetime
 
-running = False
-loop_thread = None
-last_capture_file = None
+# dumpcap (ships with Wireshark) writes packets straight to disk from C;
+# Scapy's sniff() is only used as a fallback when it isn't installed
+DUMPCAP_PATH = shutil.which("dumpcap")
+CAPTURE_INTERFACE = os.environ.get("IDS_CAPTURE_IFACE", "any")
 
+# A classic pcap file with no packets is just the 24-byte global header
+PCAP_HEADER_SIZE = 24
+
+# Max seconds between checks of the stop flag while a capture window is open
+STOP_POLL_INTERVAL = 1
+
+# Capture + inference run in their own process so run_pipeline never competes
+# with the API for the GIL. "spawn" gives it a clean interpreter (TensorFlow
+# is not fork-safe once the API process has loaded the models).
+_mp = multiprocessing.get_context("spawn")
+
+# Parent-side state, shared between the HTTP handlers of ONE server process;
+# other Gunicorn workers can't see it, so live mode runs with -w 1.
+# Each session gets its own Event so a process left over from a previous
+# session (e.g. still in run_pipeline) sees its own flag cleared and exits
+# instead of resuming.
+_state_lock = threading.Lock()
+_running = _mp.Event()
+_loop_process = None
+
+# Shared with the capture process: name of the last pcap, and a queue the
+# process puts each capture's results on for the parent's listeners
+_last_capture_file = _mp.Array("c", 256)
+_results_queue = _mp.Queue()
+_dispatch_thread = None
+
+# Callables invoked in the parent after every capture with the first
+# LISTENER_PREVIEW_ROWS predictions (counts for the whole capture in df.attrs)
+_capture_listeners = []
+LISTENER_PREVIEW_ROWS = 100
 
-def capture_once(duration=10):
-    """Capture packets for fixed time & run IDS."""
-    global running
-    if not running:
-        return None
 
-    # Capture packets
-    packets = sniff(timeout=duration)
-    if len(packets) == 0 or not running:
+def capture_once(duration=10, running=None):
+    """Capture packets for fixed time & run IDS."""
+    if running is None:
+        running = _running
+    if not running.is_set():
         return None
 
     # Generate timestamped filename
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     pcap_path = f"live/capture_{timestamp}.pcap"
-    global last_capture_file
-    last_capture_file = f"capture_{timestamp}.pcap"
 
-    # Save packets with unique filename
-    wrpcap(pcap_path, packets)
+    global DUMPCAP_PATH
+
+    # Capture packets, checking the stop flag at least every STOP_POLL_INTERVAL
+    # seconds so stop_capture() doesn't wait out the whole window
+    if DUMPCAP_PATH is not None:
+        proc = subprocess.Popen(
+            [DUMPCAP_PATH, "-q", "-i", CAPTURE_INTERFACE,
+             "-a", f"duration:{duration}", "-F", "pcap", "-w", pcap_path]
+        )
+        while proc.poll() is None:
+            if not running.is_set():
+                proc.terminate()
+                proc.wait()
+                break
+            try:
+                proc.wait(timeout=STOP_POLL_INTERVAL)
+            except subprocess.TimeoutExpired:
+                pass
+
+        if not running.is_set() or proc.returncode != 0:
+            if os.path.exists(pcap_path):
+                os.remove(pcap_path)
+            if not running.is_set():
+                return None
+            # e.g. no capture permission or unknown interface: use sniff()
+            # for the rest of this session instead of failing every window
+            print(f"[LIVE] dumpcap failed (exit code {proc.returncode}), falling back to Scapy sniff()")
+            DUMPCAP_PATH = None
+        elif os.path.getsize(pcap_path) <= PCAP_HEADER_SIZE:
+            os.remove(pcap_path)
+            return None
+
+    if DUMPCAP_PATH is None:
+        packets = []
+        for _ in range(max(1, int(duration / STOP_POLL_INTERVAL))):
+            packets.extend(sniff(timeout=STOP_POLL_INTERVAL, stop_filter=lambda p: not running.is_set()))
+            if not running.is_set():
+                break
+        if len(packets) == 0 or not running.is_set():
+            return None
+
+        # Save packets with unique filename
+        wrpcap(pcap_path, packets)
+
+    with _last_capture_file.get_lock():
+        _last_capture_file.value = f"capture_{timestamp}.pcap".encode()
 
     # Check again before running heavy pipeline
-    if not running:
+    if not running.is_set():
         return None
 
-    df = run_pipeline(pcap_path, "live/live_predictions.csv", is_pcap=True)
-    return df
+    df = run_pipeline(
+        pcap_path,
+        "live/live_predictions.csv",
+        is_pcap=True,
+        out_parquet="live/live_predictions.parquet",
+        out_summary="live/live_predictions.summary.json"
+    )
 
-def background_loop():
-    """Continuously capture flows until stopped."""
-    global running
-    running = True
+    # Only a preview crosses the process boundary; df.attrs carries the counts
+    _results_queue.put(df.head(LISTENER_PREVIEW_ROWS))
+    return df
 
-    while running:
-        df = capture_once(10)
+def background_loop(running, last_capture_file=None, results_queue=None):
+    """Continuously capture flows until stopped (runs in the capture process)."""
+    global _last_capture_file, _results_queue
+    if last_capture_file is not None:
+        _last_capture_file = last_capture_file
+    if results_queue is not None:
+        _results_queue = results_queue
+
+    while running.is_set():
+        try:
+            df = capture_once(10, running)
+        except Exception as e:
+            # Clearing the flag makes /live_status report running: false
+            print(f"[LIVE] Capture failed, stopping live mode: {e}")
+            running.clear()
+            break
 
         # Check flag again so loop breaks IMMEDIATELY
-        if not running:
+        if not running.is_set():
             break
 
         time.sleep(1)  # small gap to prevent CPU overload
 
 
-def start_capture():
-    global running, loop_thread
+def _dispatch_results():
+    """Parent-side thread: hand capture results from the process to listeners."""
+    while True:
+        try:
+            df = _results_queue.get()
+        except (EOFError, OSError):
+            return  # queue closed (interpreter shutting down)
+        for listener in list(_capture_listeners):
+            try:
+                listener(df)
+            except Exception as e:
+                print(f"[LIVE] Capture listener failed: {e}")
 
-    if running:
-        return  # Already running
 
-    running = True
-    loop_thread = threading.Thread(target=background_loop, daemon=True)
-    loop_thread.start()
+def start_capture():
+    global _running, _loop_process, _dispatch_thread
+
+    with _state_lock:
+        if is_running():
+            return  # Already running
+
+        if _dispatch_thread is None:
+            _dispatch_thread = threading.Thread(target=_dispatch_results, daemon=True)
+            _dispatch_thread.start()
+
+        _running = _mp.Event()
+        _running.set()
+        _loop_process = _mp.Process(
+            target=background_loop,
+            args=(_running, _last_capture_file, _results_queue),
+            daemon=True
+        )
+        _loop_process.start()
     return True
 
 
 def stop_capture():
-    global running, loop_thread
-    running = False
+    with _state_lock:
+        _running.clear()
+        loop_process = _loop_process
 
-    # OPTIONAL but clean: wait for thread to finish
-    if loop_thread is not None and loop_thread.is_alive():
-        loop_thread.join(timeout=1)
+    # OPTIONAL but clean: wait for process to finish
+    if loop_process is not None and loop_process.is_alive():
+        loop_process.join(timeout=2)
 
     return True
 
 def is_running():
     """Check if capture is currently running."""
-    return running
+    return _running.is_set() and _loop_process is not None and _loop_process.is_alive()
+
+def add_capture_listener(callback):
+    """Register callback(df) to run after each capture's predictions are written."""
+    with _state_lock:
+        if callback not in _capture_listeners:
+            _capture_listeners.append(callback)
 
 def get_last_capture():
     """Get the filename of the last capture file."""
-    global last_capture_file
-    return last_capture_file if last_capture_file else None
+    with _last_capture_file.get_lock():
+        value = _last_capture_file.value.decode()
+    return value if value else None
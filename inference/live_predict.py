@@ -12,12 +12,15 @@ Full inference pipeline that:
 """
 
 import argparse
+import json
+from functools import lru_cache
 from pathlib import Path
 import pandas as pd
 import numpy as np
 import pickle
 import os
 import sys
+import tempfile
 import time
 
 project_root = Path(__file__).parent.parent
@@ -32,6 +35,13 @@ try:
 except Exception:
     TF_AVAILABLE = False
 
+# Numba (optional) - compiles the per-flow anomaly scoring loops
+try:
+    import numba as nb
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False
+
 # local utils
 from utils.flow_extractor import extract_flows_from_pcap
 from utils.preprocessing import load_preprocessing_artifacts, preprocess_for_models
@@ -76,6 +86,46 @@ ANOMALY_THRESHOLD_SENSITIVITY = 0.7  # Use 70% of saved threshold = more sensiti
 ANOMALY_CONF_THRESHOLD = 0.0
 
 
+# ---- ANOMALY SCORING KERNELS ----
+# Explicit signatures compile these at import time (and cache to disk) so the
+# first capture/upload doesn't stall on JIT compilation.
+if NUMBA_AVAILABLE:
+    @nb.njit("f8[:](f4[:, :], f4[:, :])", parallel=True, nogil=True, fastmath=True, cache=True)
+    def _reconstruction_mse(X, X_recon):
+        """Per-flow mean squared reconstruction error."""
+        n_rows, n_cols = X.shape
+        mse = np.empty(n_rows, dtype=np.float64)
+        for i in nb.prange(n_rows):
+            acc = 0.0
+            for j in range(n_cols):
+                d = X[i, j] - X_recon[i, j]
+                acc += d * d
+            mse[i] = acc / n_cols
+        return mse
+
+    @nb.njit("Tuple((i8[:], f8[:]))(f8[:], f8)", parallel=True, nogil=True, fastmath=True, cache=True)
+    def _threshold_anomalies(mse, thr):
+        """Flag flows above thr and scale MSE into a 0-1 anomaly confidence."""
+        n_rows = mse.shape[0]
+        pred = np.zeros(n_rows, dtype=np.int64)
+        conf = np.empty(n_rows, dtype=np.float64)
+        for i in nb.prange(n_rows):
+            if mse[i] > thr:
+                pred[i] = 1
+            conf[i] = min(max(mse[i] / (thr + 1e-8), 0.0), 1.0)
+        return pred, conf
+else:
+    def _reconstruction_mse(X, X_recon):
+        """Per-flow mean squared reconstruction error."""
+        return np.mean((X - X_recon) ** 2, axis=1, dtype=np.float64)
+
+    def _threshold_anomalies(mse, thr):
+        """Flag flows above thr and scale MSE into a 0-1 anomaly confidence."""
+        pred = (mse > thr).astype(np.int64)
+        conf = np.clip(mse / (thr + 1e-8), 0, 1)
+        return pred, conf
+
+
 def load_models(models_dir=MODELS_DIR):
     models = {}
     import warnings
@@ -121,6 +171,30 @@ def load_models(models_dir=MODELS_DIR):
     return models
 
 
+@lru_cache(maxsize=1)
+def get_pipeline():
+    """
+    Load preprocessing artifacts and models once per process and reuse them.
+    Returns dict with keys 'artifacts' and 'models'.
+    """
+    return {
+        "artifacts": load_preprocessing_artifacts(models_dir=MODELS_DIR),
+        "models": load_models(MODELS_DIR),
+    }
+
+
+def warm_pipeline():
+    """
+    Fill the get_pipeline() cache, e.g. as a worker-process initializer.
+    Errors are only printed so missing models fail at predict time instead.
+    """
+    try:
+        get_pipeline()
+        print(f"[+] Models loaded (pid {os.getpid()})")
+    except Exception as e:
+        print(f"[!] Could not preload models: {e}")
+
+
 def _get_attack_benign_indices(binary_model):
     """
     Infer which index in predict_proba corresponds to ATTACK vs BENIGN.
@@ -157,7 +231,8 @@ def _get_attack_benign_indices(binary_model):
     return attack_idx, benign_idx
 
 
-def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
+def run_pipeline(input_path, output_csv, is_pcap=True, debug=False, out_parquet=None,
+                 out_summary=None):
     print("=" * 70)
     print("AI_IDS INFERENCE PIPELINE (SEQUENTIAL LOGIC)")
     print("=" * 70)
@@ -165,10 +240,16 @@ def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
     # 1) Extract flows if pcap, else load CSV
     if is_pcap:
         print(f"[+] Extracting flows from PCAP: {input_path}")
-        flows_csv_path = Path("live") / "live_flows.csv"
-        flows_csv_path.parent.mkdir(parents=True, exist_ok=True)
-        extract_flows_from_pcap(str(input_path), str(flows_csv_path))
-        df_raw = pd.read_csv(flows_csv_path, low_memory=False)
+        # Own flows file per call: uploads and the live capture run in
+        # separate processes at the same time
+        Path("live").mkdir(parents=True, exist_ok=True)
+        fd, flows_csv_path = tempfile.mkstemp(dir="live", prefix="live_flows_", suffix=".csv")
+        os.close(fd)
+        try:
+            extract_flows_from_pcap(str(input_path), flows_csv_path)
+            df_raw = pd.read_csv(flows_csv_path, low_memory=False)
+        finally:
+            os.remove(flows_csv_path)
     else:
         print(f"[+] Loading flows from CSV: {input_path}")
         df_raw = pd.read_csv(input_path, low_memory=False)
@@ -203,14 +284,15 @@ def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
     
     print(f"[+] Preserved metadata columns: {list(metadata_cols.keys())}")
 
-    # 2) Load artifacts
-    artifacts = load_preprocessing_artifacts(models_dir=MODELS_DIR)
+    # 2) Load artifacts + models (cached after the first call in this process)
+    pipeline = get_pipeline()
+    artifacts = pipeline["artifacts"]
 
     # 3) Preprocess for models
     X_dict, valid_indices, df_aligned = preprocess_for_models(df_raw, artifacts)
 
-    # 4) Load models
-    models = load_models(MODELS_DIR)
+    # 4) Models were loaded alongside the artifacts
+    models = pipeline["models"]
 
     # 5) Binary prediction - ALWAYS RUN (GATEKEEPER)
     print("\n[STAGE 1] Running Binary Classification...")
@@ -278,7 +360,10 @@ def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
             print(f"  Running anomaly detection on all {n_flows} flows...")
 
             X_recon = models['autoencoder'].predict(X_anom_full, verbose=0, batch_size=256)
-            mse_all = np.mean((X_anom_full - X_recon) ** 2, axis=1)
+            mse_all = _reconstruction_mse(
+                np.asarray(X_anom_full, dtype=np.float32),
+                np.asarray(X_recon, dtype=np.float32)
+            )
 
             saved_thr = models.get('threshold', None)
             
@@ -301,12 +386,7 @@ def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
                 print(f"      (Std MSE: {mse_all.std():.6f})")
 
             # Count how many flows exceed threshold
-            for i in range(n_flows):
-                is_anom = mse_all[i] > thr
-                anomaly_pred[i] = 1 if is_anom else 0
-                anomaly_conf[i] = float(
-                    np.clip(mse_all[i] / (thr + 1e-8), 0, 1)
-                )
+            anomaly_pred, anomaly_conf = _threshold_anomalies(mse_all, float(thr))
 
             num_anomalies = anomaly_pred.sum()
             print(f"  ✓ Detected {num_anomalies} anomalies out of {n_flows} flows ({100*num_anomalies/n_flows:.1f}%)")
@@ -391,25 +471,76 @@ def run_pipeline(input_path, output_csv, is_pcap=True, debug=False):
         })
 
     df_out = pd.DataFrame(results)
+
+    # Only a handful of distinct values: store as int codes + one shared str per
+    # category (smaller to pickle back from the worker and to export as records)
+    df_out["Label"] = df_out["Label"].astype("category")
+    df_out["Attack_Type"] = df_out["Attack_Type"].astype("category")
+
+    # Label / attack-type counts are computed once here and travel with the
+    # DataFrame (df.attrs) so callers don't re-scan every row for them
+    label_counts = df_out['Label'].value_counts()
+    attack_type_counts = df_out.loc[df_out['Label'] == 'ATTACK', 'Attack_Type'].value_counts()
+    attack_type_counts = attack_type_counts[attack_type_counts > 0]  # drop unused categories
+    df_out.attrs["flows"] = int(len(df_out))
+    df_out.attrs["summary"] = {
+        label: int(label_counts.get(label, 0)) for label in ("BENIGN", "ANOMALY", "ATTACK")
+    }
+    df_out.attrs["attack_types"] = {str(k): int(v) for k, v in attack_type_counts.items()}
+
     output_csv_path = Path(output_csv)
     output_csv_path.parent.mkdir(parents=True, exist_ok=True)
     df_out.to_csv(output_csv_path, index=False)
+
+    # Columnar copy for readers that only need a few columns (e.g. /live_status).
+    # Written to a temp file and swapped in so readers never see a partial file.
+    if out_parquet is not None:
+        out_parquet_path = Path(out_parquet)
+        out_parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp name: a previous live session may still be writing here
+        fd, tmp_parquet_path = tempfile.mkstemp(
+            dir=out_parquet_path.parent, prefix=out_parquet_path.name + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                df_out.to_parquet(f, engine="pyarrow", compression="zstd", index=False)
+            os.replace(tmp_parquet_path, out_parquet_path)
+        except BaseException:
+            os.unlink(tmp_parquet_path)
+            raise
+
+    # Small sidecar with just the counts, written last (and atomically) so a
+    # reader that sees the new summary also sees the matching predictions
+    if out_summary is not None:
+        out_summary_path = Path(out_summary)
+        out_summary_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_summary_path = tempfile.mkstemp(
+            dir=out_summary_path.parent, prefix=out_summary_path.name + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(df_out.attrs, f)
+            os.replace(tmp_summary_path, out_summary_path)
+        except BaseException:
+            os.unlink(tmp_summary_path)
+            raise
     
     print("\n" + "=" * 70)
     print("PREDICTION SUMMARY")
     print("=" * 70)
-    label_counts = df_out['Label'].value_counts()
     for label, count in label_counts.items():
         print(f"  {label}: {count} flows")
     
-    if 'Attack_Type' in df_out.columns:
-        attack_types = df_out[df_out['Label'] == 'ATTACK']['Attack_Type'].value_counts()
-        if len(attack_types) > 0:
-            print("\n  Attack Type Breakdown:")
-            for attack, count in attack_types.items():
-                print(f"    {attack}: {count}")
+    if len(attack_type_counts) > 0:
+        print("\n  Attack Type Breakdown:")
+        for attack, count in attack_type_counts.items():
+            print(f"    {attack}: {count}")
     
     print(f"\n[+] Saved predictions to: {output_csv_path}")
+    if out_parquet is not None:
+        print(f"[+] Saved Parquet predictions to: {out_parquet}")
+    if out_summary is not None:
+        print(f"[+] Saved prediction summary to: {out_summary}")
     print("=" * 70)
     
     return df_out